@@ -6,11 +6,15 @@
 # - Logo slides up at 10s, then BAKED into background to avoid FPS cost
 
 import asyncio, sys, math, random, time
-from dataclasses import dataclass
-from typing import List, Optional, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import pygame
 
+from physics import update_smoke, update_bombs, aa_hit_test
+
 IS_WEB = (sys.platform == "emscripten")
 
 # ---------- Config ----------
@@ -22,6 +26,7 @@ BOMB_RATE = (1.0, 2.0)
 GRAVITY = 280.0
 MAX_BOMBS = 30
 EXPLOSION_TIME = 0.60
+EXPLOSION_FRAMES = 16
 STAR_COUNT = 100
 
 SHAKE_DURATION = 0.30
@@ -41,6 +46,10 @@ AA_PUFF_DR = (14.0, 22.0)
 AA_PUFF_ALPHA0 = (120.0, 160.0)
 AA_PUFF_DA = (130.0, 190.0)
 AA_PUFF_SPREAD = 18.0
+AA_PUFF_TONE = (45, 75)
+PLANE_SMOKE_TONE = (60, 90)
+ROT_STEP_DEG = 5
+ROT_CACHE_MAX = 512
 
 # ---------- Asset paths (local only) ----------
 # Exactly 5 planes: plane1.png is PNG; others are JPG
@@ -76,6 +85,36 @@ def load_surface(path: str, has_alpha: bool, max_side: Optional[int] = None) ->
             img = pygame.transform.smoothscale(img, (int(w*s), int(h*s)))
     return img
 
+# Pre-generated samples from one distribution, handed out in order and refilled when used up
+class RingRNG:
+    def __init__(self, fn, n: int = 16384):
+        self.fn = fn; self.n = n
+        self.buf = fn(n); self.i = 0
+
+    def next(self, k: int = 1) -> np.ndarray:
+        if self.i + k > len(self.buf):
+            self.buf = self.fn(max(self.n, k)); self.i = 0
+        out = self.buf[self.i:self.i+k]
+        self.i += k
+        return out
+
+def uniform_ring(rng: np.random.Generator, low: float, high: float) -> RingRNG:
+    return RingRNG(lambda n: rng.uniform(low, high, n))
+
+# (id(sprite), bucketed degrees) -> rotated sprite, least recently used first
+rot_cache: "OrderedDict[Tuple[int,int], pygame.Surface]" = OrderedDict()
+
+def rotated_sprite(img: pygame.Surface, angle_deg: float) -> pygame.Surface:
+    key = (id(img), int(angle_deg) % 360 // ROT_STEP_DEG * ROT_STEP_DEG)
+    rot = rot_cache.get(key)
+    if rot is None:
+        rot = rot_cache[key] = pygame.transform.rotate(img, -key[1])
+        if len(rot_cache) > ROT_CACHE_MAX:
+            rot_cache.popitem(last=False)
+    else:
+        rot_cache.move_to_end(key)
+    return rot
+
 @dataclass
 class Building:
     left: int
@@ -86,24 +125,24 @@ class Building:
     peak_x: int
     peak_y: int
 
-def prerender_background(sw: int, sh: int) -> Tuple[pygame.Surface, int, List[Tuple[int,int]], List[Building]]:
+def prerender_background(sw: int, sh: int) -> Tuple[pygame.Surface, int, List[Tuple[int,int]], np.ndarray]:
     bg = pygame.Surface((sw, sh), pygame.SRCALPHA)
 
-    # Night gradient
+    # Night gradient (built as one array, blitted in a single call)
     top, bot = (5,10,20), (15,25,40)
-    for y in range(sh):
-        t = y/max(sh-1,1)
-        col = (int(top[0]*(1-t)+bot[0]*t),
-               int(top[1]*(1-t)+bot[1]*t),
-               int(top[2]*(1-t)+bot[2]*t))
-        pygame.draw.line(bg, col, (0,y), (sw,y))
+    ramp = np.linspace(0.0, 1.0, sh, dtype=np.float32)[:, None]
+    col = (np.array(top, np.float32)*(1-ramp) + np.array(bot, np.float32)*ramp).astype(np.uint8)
+    arr = np.broadcast_to(col[:, None, :], (sh, sw, 3)).copy()
 
     # Stars
-    rng = random.Random(99)
-    for _ in range(STAR_COUNT):
-        x = rng.randint(0, sw-1); y = rng.randint(0, int(sh*0.7))
-        s = rng.randint(1,2)
-        pygame.draw.rect(bg, (230,230,255), (x,y,s,s))
+    rng = np.random.default_rng(99)
+    xs = rng.integers(0, sw, STAR_COUNT)
+    ys = rng.integers(0, int(sh*0.7)+1, STAR_COUNT)
+    big = rng.integers(1, 3, STAR_COUNT) == 2
+    arr[ys, xs] = (230,230,255)
+    for dy, dx in ((0,1), (1,0), (1,1)):
+        arr[np.minimum(ys[big]+dy, sh-1), np.minimum(xs[big]+dx, sw-1)] = (230,230,255)
+    pygame.surfarray.blit_array(bg, arr.swapaxes(0, 1))
 
     # Moon
     r = int(min(sw,sh)*0.05)
@@ -132,13 +171,13 @@ def prerender_background(sw: int, sh: int) -> Tuple[pygame.Surface, int, List[Tu
         if has_peak:
             pygame.draw.polygon(bg, (shade,shade,shade),
                                 [(left, base_line_y), (peak_x, peak_y), (left+bw, base_line_y)])
-        # windows
-        win = pygame.Surface((bw,bh), pygame.SRCALPHA)
-        for yy in range(12, bh-6, 12):
-            for xx in range(6, bw-4, 12):
+        # windows (drawn straight onto the wall, pre-blended with its shade)
+        for yy in range(top+12, top+bh-6, 12):
+            for xx in range(left+6, left+bw-4, 12):
                 if rng.random()<0.035:
-                    pygame.draw.rect(win, (255,210,130, rng.randint(130,170)), (xx,yy,3,5), border_radius=1)
-        bg.blit(win, (left, top))
+                    a = rng.randint(130,170)
+                    col = tuple(shade + (c - shade)*a//255 for c in (255,210,130))
+                    pygame.draw.rect(bg, col, (xx,yy,3,5), border_radius=1)
         # damage
         if rng.random()<0.75:
             for _ in range(rng.randint(1,3)):
@@ -153,33 +192,39 @@ def prerender_background(sw: int, sh: int) -> Tuple[pygame.Surface, int, List[Tu
         buildings.append(Building(left, left+bw, top, base_line_y, has_peak, peak_x, peak_y))
         x += bw + rng.randint(int(sw*0.006), int(sw*0.018))
 
+    # Skyline height per screen column (y_base in the gaps between buildings)
+    roofline = np.full(sw, y_base, np.int32)
+    for b in buildings:
+        xs = np.arange(b.left, min(b.right, sw-1)+1)
+        if not b.has_peak:
+            roofline[xs] = b.rect_top
+            continue
+        frac = np.where(xs <= b.peak_x,
+                        (xs - b.left) / max(1, b.peak_x - b.left),
+                        (b.right - xs) / max(1, b.right - b.peak_x))
+        roofline[xs] = (b.base_line_y - frac * (b.base_line_y - b.peak_y)).astype(np.int32)
+
     try: bg = bg.convert()
     except Exception: pass
 
     random.shuffle(damage_spots)
-    return bg, y_base, damage_spots[:20], buildings
-
-def roofline_y_for_x(x: int, buildings: List[Building], default_y: int) -> int:
-    for b in buildings:
-        if b.left <= x <= b.right:
-            if not b.has_peak:
-                return b.rect_top
-            if x <= b.peak_x:
-                frac = (x - b.left) / max(1, b.peak_x - b.left)
-                return int(b.base_line_y - frac * (b.base_line_y - b.peak_y))
-            frac = (b.right - x) / max(1, b.right - b.peak_x)
-            return int(b.base_line_y - frac * (b.base_line_y - b.peak_y))
-    return default_y
+    return bg, y_base, damage_spots[:20], roofline
+
+def build_flag_anchor(flag_img: pygame.Surface, sw: int, roofline: np.ndarray, sway_seed: float) -> dict:
+    xmid = int(sw * 0.5)
+    roof_y = int(roofline[min(max(xmid, 0), sw-1)])
+    yflag = int(roof_y - flag_img.get_height() + 2)
+    shadow = pygame.Surface(flag_img.get_size(), pygame.SRCALPHA); shadow.fill((0,0,0,95))
+    try: shadow = shadow.convert_alpha()
+    except Exception: pass
+    return dict(x=xmid, y=yflag, roof_y=roof_y, img=flag_img, half_w=flag_img.get_width()//2,
+                shadow=shadow, sway_seed=sway_seed)
 
 # ---------- Entities ----------
-@dataclass
-class Bomb:
-    x: float; y: float; vy: float
-    exploded: bool=False; start: float=0.0; hit_y: float=0.0
-
 @dataclass
 class Plane:
-    img: pygame.Surface; x: float; y: float; vx: float
+    img: pygame.Surface; img_flipped: pygame.Surface  # facing left / right
+    x: float; y: float; vx: float
     next_bomb: float; original_facing: str
     vy: float = 0.0
     angle: float = 0.0
@@ -187,23 +232,128 @@ class Plane:
     on_fire: bool = False
     dying: bool = False
     invuln_until: float = 0.0
-
-@dataclass
-class Smoke:
-    x: float; y: float; r: float; vy: float; a: float
-    tone: int = 125
-
-@dataclass
-class Fire:
-    x: float; y: float; base_r: float; phase: float
-
-@dataclass
-class AAShot:
-    x: float; y: float; vx: float; vy: float; target_y: float; alive: bool=True
-
-@dataclass
-class AABurst:
-    x: float; y: float; start: float; radius: float
+    w: int = field(default=0, init=False)  # sprite size, cached from img
+    h: int = field(default=0, init=False)
+
+    def __post_init__(self):
+        self.w, self.h = self.img.get_size()
+
+# Fixed-capacity ring of short-lived effects stored as parallel preallocated NumPy columns.
+# Each field is an attribute holding a view of its column's live rows. Once full, adds
+# overwrite the oldest row at `head`; filtering rotates back to age order first.
+class ParticleSoA:
+    fields: Tuple[str, ...] = ()
+    dtypes: Dict[str, type] = {}  # columns not listed are float64
+    capacity: int = 0
+
+    def __init__(self):
+        self._buf = {name: np.zeros(self.capacity, self.dtypes.get(name, np.float64)) for name in self.fields}
+        self.head = 0  # oldest row once the ring has wrapped
+        self.truncate(0)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def truncate(self, n: int):
+        # every change of count goes through here to refresh the field views
+        self.count = n
+        for name, buf in self._buf.items():
+            setattr(self, name, buf[:n])
+
+    def clear(self):
+        self.head = 0
+        self.truncate(0)
+
+    def add(self, **cols):
+        if not any(isinstance(v, np.ndarray) for v in cols.values()):
+            # one row: write it in place
+            if self.count < self.capacity:
+                i = self.count
+                self.truncate(i + 1)
+            else:
+                i = self.head
+                self.head = (i + 1) % self.capacity
+            for name, buf in self._buf.items():
+                buf[i] = cols[name]
+            return
+        total = np.broadcast(*cols.values()).size
+        k = min(total, self.capacity)
+        if k == 0: return
+        room = min(k, self.capacity - self.count)
+        idx = np.arange(self.count, self.count + room)
+        if k > room:
+            idx = np.concatenate((idx, (self.head + np.arange(k - room)) % self.capacity))
+            self.head = (self.head + k - room) % self.capacity
+        if room: self.truncate(self.count + room)
+        for name, buf in self._buf.items():
+            buf[idx] = np.broadcast_to(cols[name], (total,))[total-k:]
+
+    def _unwrap(self):
+        # rotate a wrapped ring so the oldest row is first again
+        if self.head:
+            for buf in self._buf.values():
+                buf[:] = np.roll(buf, -self.head)
+            self.head = 0
+
+    def compact(self, mask: np.ndarray):
+        # keep the rows where mask is True, in age order
+        n = int(np.count_nonzero(mask))
+        if n == self.count: return
+        if self.head:
+            mask = np.roll(mask, -self.head)
+            self._unwrap()
+        for name, buf in self._buf.items():
+            buf[:n] = buf[:self.count][mask]
+        self.truncate(n)
+
+class SmokeSoA(ParticleSoA):
+    fields = ("x", "y", "r", "vy", "a", "tone")
+    capacity = MAX_SMOKE
+
+    def update(self, dt: float, puff_dr: RingRNG, puff_da: RingRNG):
+        self._unwrap()  # the kernel compacts in storage order
+        n = self.count
+        self.truncate(update_smoke(self.x, self.y, self.vy, self.r, self.a, self.tone,
+                                   puff_dr.next(n), puff_da.next(n), dt))
+
+class BombSoA(ParticleSoA):
+    fields = ("x", "y", "vy", "exploded", "start", "hit_y")
+    dtypes = {"exploded": np.bool_}
+    capacity = MAX_BOMBS
+
+    def update(self, now: float, dt: float) -> int:
+        # returns how many bombs hit the ground this frame
+        if not self.count: return 0
+        hits = update_bombs(self.y, self.vy, self.hit_y, self.exploded, self.start, now, dt, GRAVITY)
+        self.compact(~self.exploded | ((now - self.start) < EXPLOSION_TIME))
+        return hits
+
+class AABurstSoA(ParticleSoA):
+    fields = ("x", "y", "start", "radius")
+    capacity = AA_MAX_SHOTS
+
+class FireSoA(ParticleSoA):
+    fields = ("x", "y", "base_r", "phase")
+    capacity = MAX_FIRES
+
+    def update(self, dt: float) -> np.ndarray:
+        # returns the current flame size per fire
+        self.phase += dt*6.0
+        np.mod(self.phase, math.tau, out=self.phase)
+        return self.base_r * (1.0 + 0.25*np.sin(self.phase) + 0.08*np.sin(3*self.phase))
+
+class AAShotSoA(ParticleSoA):
+    fields = ("x", "y", "vx", "vy", "target_y")
+    capacity = AA_MAX_SHOTS
+
+    def update(self, dt: float) -> np.ndarray:
+        # removes shots that reached altitude and returns their (x, y) rows
+        self.x += self.vx*dt; self.y += self.vy*dt
+        burst = (self.y <= self.target_y) | (self.y < 20)
+        if not burst.any(): return np.empty((0, 2))
+        done = np.column_stack((self.x[burst], self.y[burst]))
+        self.compact(~burst)
+        return done
 
 # ---------- Effects ----------
 def draw_explosion(surface: pygame.Surface, cx: int, cy: int, t: float):
@@ -215,25 +365,60 @@ def draw_explosion(surface: pygame.Surface, cx: int, cy: int, t: float):
     pygame.draw.circle(surface, (255,240,170,int(a*0.9)), (cx,cy), int(R*0.28))
     pygame.draw.circle(surface, (60,60,60,int(a*0.6)), (cx,cy), R, 3)
 
-def draw_beam(screen, base_xy, angle_deg, length, width,
-              alpha_outer=70, alpha_core=110, core_scale=0.42):
-    x0, y0 = base_xy
-    ang = math.radians(angle_deg)
-    dx, dy = math.cos(ang), math.sin(ang)
-    x1, y1 = x0 + dx*length, y0 + dy*length
-    px, py = -dy, dx
-    hw  = width * 0.5
-    chw = hw * core_scale
-    p1 = (int(x0 + px*hw),  int(y0 + py*hw))
-    p2 = (int(x0 - px*hw),  int(y0 - py*hw))
-    p3 = (int(x1 - px*hw),  int(y1 - py*hw))
-    p4 = (int(x1 + px*hw),  int(y1 + py*hw))
-    pygame.draw.polygon(screen, (235,235,255, alpha_outer), (p1,p2,p3,p4))
-    c1 = (int(x0 + px*chw), int(y0 + py*chw))
-    c2 = (int(x0 - px*chw), int(y0 - py*chw))
-    c3 = (int(x1 - px*chw), int(y1 - py*chw))
-    c4 = (int(x1 + px*chw), int(y1 + py*chw))
-    pygame.draw.polygon(screen, (240,240,255, alpha_core), (c1,c2,c3,c4))
+# Effect sprites are opaque surfaces with black keyed out: pygame.draw ignores alpha on the
+# display, so this reproduces the circles exactly, and RLE blits copy only the drawn runs
+
+# draw_explosion at evenly spaced t, each frame cropped to its pixels as (surface, dx, dy)
+# from the centre; also returns the largest frame's side
+def build_explosion_frames() -> Tuple[List[Tuple[pygame.Surface, int, int]], int]:
+    D = 2*(36 + 140) + 2  # largest ring at t=0
+    frames = []
+    for i in range(EXPLOSION_FRAMES):
+        surf = pygame.Surface((D, D))
+        surf.set_colorkey((0,0,0))
+        draw_explosion(surf, D//2, D//2, i / (EXPLOSION_FRAMES - 1))
+        rect = surf.get_bounding_rect()
+        frame = surf.subsurface(rect).copy()
+        frame.set_colorkey((0,0,0), pygame.RLEACCEL)
+        frames.append((frame, rect.x - D//2, rect.y - D//2))
+    return frames, D
+
+# Fire glow rings (outer glow → white core) for one set of ring radii, centred at (r0, r0)
+def build_fire_sprite(radii: Tuple[int, int, int, int]) -> pygame.Surface:
+    r0 = radii[0]
+    surf = pygame.Surface((2*r0 + 1, 2*r0 + 1))
+    for col, r in zip(((255,120,40), (255,160,60), (255,200,110), (255,240,170)), radii):
+        pygame.draw.circle(surf, col, (r0, r0), r)
+    surf.set_colorkey((0,0,0), pygame.RLEACCEL)
+    return surf
+
+def build_beam_sprite(length: int, width: int, core_scale=0.42) -> pygame.Surface:
+    # pointing straight up, base at the bottom centre; opaque like the polygons drawn on the
+    # display, black keyed out so rotation pads with transparent corners
+    surf = pygame.Surface((width, length))
+    surf.fill((235,235,255))
+    cw = int(width * core_scale)
+    surf.fill((240,240,255), ((width - cw)//2, 0, cw, length))
+    try: surf = surf.convert()
+    except Exception: pass
+    surf.set_colorkey((0,0,0))
+    return surf
+
+def blit_beam(screen: pygame.Surface, beam: pygame.Surface, cache: dict,
+              base_xy, angle_deg: float) -> pygame.Rect:
+    # angle_deg in screen coords, -90 is up; rotations are cached per whole degree
+    key = round(angle_deg)
+    rot = cache.get(key)
+    if rot is None:
+        if len(cache) >= 360: cache.clear()
+        rot = cache[key] = pygame.transform.rotate(beam, -key - 90)
+        rot.set_colorkey((0,0,0), pygame.RLEACCEL)  # RLE blits skip the keyed corners outright
+    # the base sits half a beam length below the sprite centre; rotate that offset with it
+    d = math.radians(key + 90)
+    half = beam.get_height() / 2
+    cx = base_xy[0] + math.sin(d)*half
+    cy = base_xy[1] - math.cos(d)*half
+    return screen.blit(rot, (int(cx - rot.get_width()/2), int(cy - rot.get_height()/2)))
 
 # ---------- Logo (slide-up, then bake) ----------
 def try_load_font(size: int) -> pygame.font.Font:
@@ -276,7 +461,7 @@ async def game():
     pygame.init()
 
     # Windowed canvas; pygbag scales it to browser window
-    screen = pygame.display.set_mode((1280, 720), pygame.RESIZABLE | pygame.DOUBLEBUF)
+    screen = pygame.display.set_mode((1280, 720), pygame.RESIZABLE)
     clock = pygame.time.Clock()
 
     # Load assets (local only; one PNG + four JPGs)
@@ -284,6 +469,7 @@ async def game():
     for path, has_alpha in PLANE_FILES:
         surf = load_surface(path, has_alpha, max_side=PLANE_MAX_SIDE)
         plane_sprites.append(surf)
+    plane_sprites_flipped = [pygame.transform.flip(s, True, False) for s in plane_sprites]
 
     try:
         flag_img = load_surface(US_FLAG_FILE, True, max_side=max(44, int(min(*screen.get_size()) * 0.06)))
@@ -291,9 +477,7 @@ async def game():
         flag_img = None
 
     sw, sh = screen.get_size()
-    bg, city_base_y, damage_spots, buildings = prerender_background(sw, sh)
-    bg_with_logo = None
-    using_baked_logo = False
+    bg, city_base_y, damage_spots, roofline = prerender_background(sw, sh)
     ground_y = sh - 2
 
     rng = random.Random(7)
@@ -303,19 +487,25 @@ async def game():
     planes: List[Plane] = []
     for i in range(min(MAX_PLANES, max(len(plane_sprites), MAX_PLANES))):
         img = plane_sprites[i % len(plane_sprites)]
+        img_flipped = plane_sprites_flipped[i % len(plane_sprites)]
         dir_right = (i % 2 == 0)
         speed = rng.uniform(sw*0.06, sw*0.10) * (1 if dir_right else -1)
         y = rng.choice(lanes)
         x = (-img.get_width() - rng.uniform(40,260)) if dir_right else (sw + rng.uniform(40,260))
-        planes.append(Plane(img, x, y, speed, time.time()+rng.uniform(*BOMB_RATE), "left"))
-
-    bombs: List[Bomb] = []
-    smokes: List[Smoke] = []
-    fires: List[Fire] = [Fire(x=sx+rng.uniform(-2,2),
-                              y=sy+rng.uniform(-2,2),
-                              base_r=rng.uniform(4,8),
-                              phase=rng.uniform(0, math.tau))
-                         for sx, sy in damage_spots[:MAX_FIRES]]
+        planes.append(Plane(img, img_flipped, x, y, speed, time.monotonic()+rng.uniform(*BOMB_RATE), "left"))
+
+    bombs = BombSoA()
+    np_rng = np.random.default_rng()
+    # per-puff rates are drawn in bulk; scalar draws stay on `random`, which is cheaper per call
+    puff_dr = uniform_ring(np_rng, *AA_PUFF_DR)
+    puff_da = uniform_ring(np_rng, *AA_PUFF_DA)
+    smokes = SmokeSoA()
+    fires = FireSoA()
+    for sx, sy in damage_spots[:MAX_FIRES]:
+        fires.add(x=sx+rng.uniform(-2,2),
+                  y=sy+rng.uniform(-2,2),
+                  base_r=rng.uniform(4,8),
+                  phase=rng.uniform(0, math.tau))
 
     # AA
     aa_bases = []
@@ -323,12 +513,16 @@ async def game():
         step = sw // (AA_BATTERIES + 1)
         for i in range(1, AA_BATTERIES+1):
             aa_bases.append((i*step, city_base_y+2))
-    aa_next_fire = [time.time() + rng.uniform(0.4, 1.1) for _ in aa_bases]
-    aa_shots: List[AAShot] = []
-    aa_bursts: List[AABurst] = []
+    aa_next_fire = [time.monotonic() + rng.uniform(0.4, 1.1) for _ in aa_bases]
+    aa_shots = AAShotSoA()
+    expl_frames, expl_d = build_explosion_frames()
+    fire_cache = {}  # ring radii -> fire sprite
+    aa_bursts = AABurstSoA()
 
     # Searchlights
     s_bases = [(int(sw*0.15), sh-2), (int(sw*0.50), sh-2), (int(sw*0.85), sh-2)]
+    beam_sprite = build_beam_sprite(int(sh * 1.08), int(min(sw, sh) * 0.07))
+    beam_cache = {}  # rounded angle -> rotated beam_sprite
     sl_phase = [rng.uniform(0, math.tau) for _ in s_bases]
     sl_speed = [0.50 + 0.25*i + rng.uniform(-0.08, 0.08) for i in range(len(s_bases))]
     sl_amp   = [14 + i*1.5 + rng.uniform(-2.0, 2.0) for i in range(len(s_bases))]
@@ -336,20 +530,14 @@ async def game():
     # Flag anchor (US only)
     flag_anchor = None
     if flag_img is not None:
-        xmid = int(sw * 0.5)
-        roof_y = roofline_y_for_x(xmid, buildings, city_base_y)
-        yflag = int(roof_y - flag_img.get_height() + 2)
-        shadow = pygame.Surface(flag_img.get_size(), pygame.SRCALPHA); shadow.fill((0,0,0,95))
-        try: shadow = shadow.convert_alpha()
-        except Exception: pass
-        flag_anchor = dict(x=xmid, y=yflag, roof_y=roof_y, img=flag_img, shadow=shadow, sway_seed=rng.uniform(0,1000))
+        flag_anchor = build_flag_anchor(flag_img, sw, roofline, rng.uniform(0,1000))
 
     # Logo card (pre-rendered)
     logo_card, logo_rect = build_logo_card(sw, sh)
     logo_center_y = sh // 2
     logo_start_y  = sh + logo_rect.height // 2 + 20
     logo_rect.center = (sw // 2, logo_start_y)
-    logo_show_time = time.time() + 10.0
+    logo_show_time = time.monotonic() + 10.0
     logo_slide_dur = 1.4
     logo_active = False
     logo_parked = False
@@ -358,10 +546,19 @@ async def game():
     show_fps = False
     font = pygame.font.SysFont(None, 20)
 
+    sin, deg = math.sin, math.degrees  # bound once for the frame loop
     running = True
+    last_frame = time.monotonic()
     while running:
-        dt = clock.tick(TARGET_FPS)/1000.0
-        now = time.time()
+        if IS_WEB:
+            # Browser rAF already paces to vsync; an uncapped tick() only keeps get_fps() valid
+            clock.tick()
+            now = time.monotonic()
+            dt = now - last_frame
+            last_frame = now
+        else:
+            dt = clock.tick_busy_loop(TARGET_FPS)/1000.0
+            now = time.monotonic()
 
         for e in pygame.event.get():
             if e.type == pygame.QUIT:
@@ -373,8 +570,8 @@ async def game():
                     show_fps = not show_fps
             elif e.type == pygame.VIDEORESIZE:
                 sw, sh = e.w, e.h
-                screen = pygame.display.set_mode((sw, sh), pygame.RESIZABLE | pygame.DOUBLEBUF)
-                bg, city_base_y, damage_spots, buildings = prerender_background(sw, sh)
+                screen = pygame.display.set_mode((sw, sh), pygame.RESIZABLE)
+                bg, city_base_y, damage_spots, roofline = prerender_background(sw, sh)
                 lanes = [sh*0.2, sh*0.28, sh*0.36]
                 s_bases = [(int(sw*0.15), sh-2), (int(sw*0.50), sh-2), (int(sw*0.85), sh-2)]
                 aa_bases = []
@@ -382,6 +579,8 @@ async def game():
                     step = sw // (AA_BATTERIES + 1)
                     for i in range(1, AA_BATTERIES+1):
                         aa_bases.append((i*step, city_base_y+2))
+                beam_sprite = build_beam_sprite(int(sh * 1.08), int(min(sw, sh) * 0.07))
+                beam_cache.clear()
                 aa_next_fire = [now + random.uniform(0.4,1.1) for _ in aa_bases]
                 # resize flag
                 try:
@@ -390,23 +589,16 @@ async def game():
                     flag_img = None
                 flag_anchor = None
                 if flag_img is not None:
-                    xmid = int(sw * 0.5)
-                    roof_y = roofline_y_for_x(xmid, buildings, city_base_y)
-                    yflag = int(roof_y - flag_img.get_height() + 2)
-                    shadow = pygame.Surface(flag_img.get_size(), pygame.SRCALPHA); shadow.fill((0,0,0,95))
-                    try: shadow = shadow.convert_alpha()
-                    except Exception: pass
-                    flag_anchor = dict(x=xmid, y=yflag, roof_y=roof_y, img=flag_img, shadow=shadow, sway_seed=random.uniform(0,1000))
+                    flag_anchor = build_flag_anchor(flag_img, sw, roofline, random.uniform(0,1000))
                 # rebuild logo card placement
                 logo_card, logo_rect = build_logo_card(sw, sh)
                 logo_center_y = sh // 2
                 logo_start_y  = sh + logo_rect.height // 2 + 20
                 if logo_parked:
                     logo_rect.center = (sw // 2, logo_center_y)
+                    bg.blit(logo_card, logo_rect.topleft)
                 else:
                     logo_rect.center = (sw // 2, logo_start_y)
-                bg_with_logo = None
-                using_baked_logo = False
 
         # Trigger logo slide
         if not logo_active and not logo_parked and now >= logo_show_time:
@@ -421,50 +613,38 @@ async def game():
                 p.x  += p.vx*dt*0.5
                 p.angle += p.spin*dt
                 if random.random()<0.6:
-                    smokes.append(Smoke(p.x + p.img.get_width()/2 + random.uniform(-8,8),
-                                        p.y + p.img.get_height()/2 + random.uniform(-8,8),
-                                        r=random.uniform(3.5,6.5),
-                                        vy=random.uniform(-24,-8),
-                                        a=random.uniform(110,150),
-                                        tone=random.randint(60,90)))
+                    smokes.add(x=p.x + p.w/2 + random.uniform(-8,8),
+                               y=p.y + p.h/2 + random.uniform(-8,8),
+                               r=random.uniform(3.5,6.5),
+                               vy=random.uniform(-24,-8),
+                               a=random.uniform(110,150),
+                               tone=random.randint(*PLANE_SMOKE_TONE))
                 if p.y > sh + 120:
-                    img = p.img
                     dir_right = (p.vx > 0)
                     p.on_fire = p.dying = False
                     p.vy = p.angle = p.spin = 0.0
                     p.invuln_until = 0.0
                     p.y = random.choice(lanes)
-                    p.x = -img.get_width() - random.uniform(40,260) if dir_right else (sw + random.uniform(40,260))
+                    p.x = -p.w - random.uniform(40,260) if dir_right else (sw + random.uniform(40,260))
             else:
                 p.x += p.vx*dt
 
             if now >= p.next_bomb and not p.dying and len(bombs) < MAX_BOMBS:
-                bombs.append(Bomb(p.x + p.img.get_width()/2,
-                                  p.y + p.img.get_height()*0.85,
-                                  160.0, False, now, sh-2))
+                bombs.add(x=p.x + p.w/2,
+                          y=p.y + p.h*0.85,
+                          vy=160.0, exploded=False, start=now, hit_y=sh-2)
                 p.next_bomb = now + random.uniform(*BOMB_RATE)
 
             if not p.dying:
                 if p.vx > 0 and p.x > sw + 60:
-                    p.x = -p.img.get_width() - random.uniform(40,260); p.y = random.choice(lanes)
-                elif p.vx < 0 and p.x + p.img.get_width() < -60:
+                    p.x = -p.w - random.uniform(40,260); p.y = random.choice(lanes)
+                elif p.vx < 0 and p.x + p.w < -60:
                     p.x = sw + random.uniform(40,260); p.y = random.choice(lanes)
 
         # Bombs
-        new_bombs=[]
-        for b in bombs:
-            if not b.exploded:
-                b.vy += GRAVITY*dt
-                b.y  += b.vy*dt
-                if b.y >= b.hit_y:
-                    b.exploded = True; b.start = now
-                    shake_until = now + SHAKE_DURATION
-                    shake_strength = min(SHAKE_STRENGTH, shake_strength + SHAKE_STRENGTH*0.6)
-                new_bombs.append(b)
-            else:
-                if (now - b.start) < EXPLOSION_TIME:
-                    new_bombs.append(b)
-        bombs = new_bombs
+        if bombs.update(now, dt):
+            shake_until = now + SHAKE_DURATION
+            shake_strength = min(SHAKE_STRENGTH, shake_strength + SHAKE_STRENGTH*0.6)
 
         # AA spawn/update
         for i, base in enumerate(aa_bases):
@@ -474,60 +654,44 @@ async def game():
                 burst_y  = random.randint(top_alt, bot_alt)
                 vx = random.uniform(-100.0, 100.0)
                 vy = -500.0 - random.uniform(0,120)
-                aa_shots.append(AAShot(x=base[0]+random.uniform(-6,6),
-                                       y=base[1], vx=vx, vy=vy,
-                                       target_y=burst_y, alive=True))
+                aa_shots.add(x=base[0]+random.uniform(-6,6),
+                             y=base[1], vx=vx, vy=vy,
+                             target_y=burst_y)
                 aa_next_fire[i] = now + random.uniform(AA_SPAWN_RATE*0.8, AA_SPAWN_RATE*1.3)
 
-        new_shots=[]; aa_bursts=[]
-        for s in aa_shots:
-            if s.alive:
-                s.x += s.vx*dt; s.y += s.vy*dt
-                if s.y <= s.target_y or s.y < 20:
-                    s.alive=False
-                    aa_bursts.append(AABurst(s.x, s.y, now, radius=48))
-                    n = random.randint(*AA_SMOKE_PUFFS)
-                    for _ in range(n):
-                        ox = random.uniform(-AA_PUFF_SPREAD, AA_PUFF_SPREAD)
-                        oy = random.uniform(-AA_PUFF_SPREAD*0.6, AA_PUFF_SPREAD*0.6)
-                        smokes.append(Smoke(
-                            x=s.x+ox, y=s.y+oy,
-                            r=random.uniform(*AA_PUFF_R0),
-                            vy=random.uniform(*AA_PUFF_VY),
-                            a=random.uniform(*AA_PUFF_ALPHA0),
-                            tone=random.randint(45,75)
-                        ))
-                else:
-                    new_shots.append(s)
-        aa_shots = new_shots[:AA_MAX_SHOTS]
+        aa_bursts.clear()
+        done = aa_shots.update(dt)
+        if len(done):
+            aa_bursts.add(x=done[:, 0], y=done[:, 1], start=now, radius=48)
+        for bx, by in done.tolist():
+            n = random.randint(*AA_SMOKE_PUFFS)
+            smokes.add(x=bx + np_rng.uniform(-AA_PUFF_SPREAD, AA_PUFF_SPREAD, n),
+                       y=by + np_rng.uniform(-AA_PUFF_SPREAD*0.6, AA_PUFF_SPREAD*0.6, n),
+                       r=np_rng.uniform(*AA_PUFF_R0, n),
+                       vy=np_rng.uniform(*AA_PUFF_VY, n),
+                       a=np_rng.uniform(*AA_PUFF_ALPHA0, n),
+                       tone=np_rng.integers(AA_PUFF_TONE[0], AA_PUFF_TONE[1]+1, n))
 
         # AA burst → plane hit (short window)
         hit_window = 0.18
-        for burst in aa_bursts:
-            if now - burst.start > hit_window: continue
-            bx, by, R = burst.x, burst.y, burst.radius
-            R2 = R*R
-            for p in planes:
-                if p.dying or now < p.invuln_until: continue
-                cx = p.x + p.img.get_width()/2
-                cy = p.y + p.img.get_height()/2
-                if (cx-bx)*(cx-bx) + (cy-by)*(cy-by) <= R2:
-                    shake_until = max(shake_until, now + 0.22)
-                    p.on_fire = True; p.dying = True
-                    p.vy = -60.0
-                    p.spin = random.uniform(-2.5, 2.5)
-                    p.vx *= 0.65
-                    p.invuln_until = now + 2.0
-                    break
+        active = (now - aa_bursts.start) <= hit_window
+        if active.any():
+            plane_cx = np.array([p.x + p.w/2 for p in planes])
+            plane_cy = np.array([p.y + p.h/2 for p in planes])
+            eligible = np.array([not p.dying and now >= p.invuln_until for p in planes])
+            hits = aa_hit_test(plane_cx, plane_cy, eligible, aa_bursts.x[active], aa_bursts.y[active],
+                               aa_bursts.radius[active]**2)
+            for i in hits[hits >= 0].tolist():
+                p = planes[i]
+                shake_until = max(shake_until, now + 0.22)
+                p.on_fire = True; p.dying = True
+                p.vy = -60.0
+                p.spin = random.uniform(-2.5, 2.5)
+                p.vx *= 0.65
+                p.invuln_until = now + 2.0
 
         # Smoke update
-        new_smoke=[]
-        for s in smokes:
-            s.y += s.vy*dt
-            s.r += random.uniform(AA_PUFF_DR[0], AA_PUFF_DR[1]) * dt
-            s.a -= random.uniform(AA_PUFF_DA[0], AA_PUFF_DA[1]) * dt
-            if s.a > 6: new_smoke.append(s)
-        smokes = new_smoke[-MAX_SMOKE:]
+        smokes.update(dt, puff_dr, puff_da)
 
         # Shake
         ox=oy=0
@@ -538,69 +702,75 @@ async def game():
             oy = int(random.uniform(-mag, mag))
 
         # ---------- DRAW ----------
-        if using_baked_logo and bg_with_logo is not None:
-            screen.blit(bg_with_logo, (ox, oy))
-        else:
-            screen.fill((0,0,0))
-            screen.blit(bg, (ox, oy))
+        screen.blit(bg, (ox, oy))
+        if ox or oy:
+            # a shaken bg leaves a strip uncovered along one or two edges
+            screen.fill((0,0,0), (0 if ox > 0 else sw+ox, 0, abs(ox), sh))
+            screen.fill((0,0,0), (0, 0 if oy > 0 else sh+oy, sw, abs(oy)))
 
         # Searchlights
-        beam_len = int(sh * 1.08)
-        beam_w   = int(min(sw, sh) * 0.07)
         for i, base in enumerate(s_bases):
             sl_phase[i] += dt * sl_speed[i]
-            ang = -90 + math.sin(sl_phase[i] + math.pi) * sl_amp[i]
-            draw_beam(screen, (base[0]+ox, base[1]+oy), ang,
-                      length=beam_len, width=beam_w,
-                      alpha_outer=70, alpha_core=110, core_scale=0.42)
+            ang = -90 + sin(sl_phase[i] + math.pi) * sl_amp[i]
+            blit_beam(screen, beam_sprite, beam_cache, (base[0]+ox, base[1]+oy), ang)
+            # housing stays on top of its beam
             pygame.draw.rect(screen, (40,40,48), (base[0]-6+ox, base[1]-8+oy, 12, 8))
 
         # Fires
-        for f in fires:
-            f.phase = (f.phase + dt*6.0) % math.tau
-            size = f.base_r * (1.0 + 0.25*math.sin(f.phase) + 0.08*math.sin(3*f.phase))
-            cx, cy = int(f.x)+ox, int(f.y)+oy
-            pygame.draw.circle(screen, (255,120,40,80), (cx,cy), int(size*2.2))
-            pygame.draw.circle(screen, (255,160,60,160), (cx,cy), int(size*1.5))
-            pygame.draw.circle(screen, (255,200,110,180), (cx,cy), int(size*1.1))
-            pygame.draw.circle(screen, (255,240,170,200), (cx,cy), max(1,int(size*0.7)))
+        fire_sizes = fires.update(dt)
+        for fx, fy, size in zip(fires.x.tolist(), fires.y.tolist(), fire_sizes.tolist()):
+            radii = (int(size*2.2), int(size*1.5), int(size*1.1), max(1, int(size*0.7)))
+            sprite = fire_cache.get(radii)
+            if sprite is None:
+                sprite = fire_cache[radii] = build_fire_sprite(radii)
+            screen.blit(sprite, (int(fx)-radii[0]+ox, int(fy)-radii[0]+oy))
 
         # Smoke draw
-        for s in smokes:
-            tone = max(30, min(200, s.tone))
-            pygame.draw.circle(screen, (tone,tone,tone,int(s.a)), (int(s.x)+ox, int(s.y)+oy), int(s.r))
+        # Offscreen culling works in screen space, so shake offsets are included
+        vis = ((smokes.x + smokes.r + ox >= 0) & (smokes.x - smokes.r + ox <= sw) &
+               (smokes.y + smokes.r + oy >= 0) & (smokes.y - smokes.r + oy <= sh))
+        # puffs are opaque: pygame.draw ignores alpha on the display surface
+        tones = np.clip(smokes.tone[vis], 30, 200).astype(np.int32)
+        for sx, sy, sr, tone in zip(smokes.x[vis].tolist(), smokes.y[vis].tolist(), smokes.r[vis].tolist(),
+                                    tones.tolist()):
+            pygame.draw.circle(screen, (tone,tone,tone), (int(sx)+ox, int(sy)+oy), int(sr))
 
         # Bombs/explosions
-        for b in bombs:
-            if not b.exploded:
-                pygame.draw.circle(screen, (225,225,235), (int(b.x)+ox, int(b.y)+oy), 2)
-                pygame.draw.circle(screen, (40,40,40), (int(b.x)+ox, int(b.y)+oy), 4, 1)
+        for bx, by, exploded, start, hit_y in zip(bombs.x.tolist(), bombs.y.tolist(), bombs.exploded.tolist(),
+                                                  bombs.start.tolist(), bombs.hit_y.tolist()):
+            if not exploded:
+                if bx+ox < -10 or bx+ox > sw+10: continue
+                pygame.draw.circle(screen, (225,225,235), (int(bx)+ox, int(by)+oy), 2)
+                pygame.draw.circle(screen, (40,40,40), (int(bx)+ox, int(by)+oy), 4, 1)
             else:
-                t = (now - b.start)/EXPLOSION_TIME
+                t = (now - start)/EXPLOSION_TIME
+                if bx+ox + expl_d//2 < 0 or bx+ox - expl_d//2 > sw: continue
                 if t <= 1.0:
-                    draw_explosion(screen, int(b.x)+ox, int(b.hit_y)+oy, t)
+                    frame, fx, fy = expl_frames[int(t*(EXPLOSION_FRAMES-1))]
+                    screen.blit(frame, (int(bx)+fx+ox, int(hit_y)+fy+oy))
 
         # Planes
         for p in planes:
-            img = p.img
-            flip = (p.vx > 0)  # assume original facing left
-            if flip: img = pygame.transform.flip(img, True, False)
-            if p.dying or p.angle != 0.0:
-                rot_img = pygame.transform.rotozoom(img, -math.degrees(p.angle), 1.0)
-                screen.blit(rot_img, (int(p.x)+ox, int(p.y)+oy))
+            rotated = p.dying or p.angle != 0.0
+            ext = p.w + p.h if rotated else 0  # rotated sprites grow up to w+h per side
+            x, y = int(p.x)+ox, int(p.y)+oy
+            if x > sw or y > sh or x + max(p.w, ext) < 0 or y + max(p.h, ext) < 0: continue
+            img = p.img_flipped if p.vx > 0 else p.img  # assume original facing left
+            if rotated:
+                screen.blit(rotated_sprite(img, deg(p.angle)), (x, y))
             else:
-                screen.blit(img, (int(p.x)+ox, int(p.y)+oy))
+                screen.blit(img, (x, y))
 
         # US Flag
         if flag_anchor is not None:
-            wobble = math.sin((now*0.9) + flag_anchor["sway_seed"]) * 3.0
+            wobble = sin((now*0.9) + flag_anchor["sway_seed"]) * 3.0
             px = int(flag_anchor["x"]) + ox
             py = int(flag_anchor["y"] + wobble) + oy
-            pole_x = px - flag_anchor["img"].get_width()//2
+            pole_x = px - flag_anchor["half_w"]
             pole_bottom_y = flag_anchor["roof_y"] + oy + 1
             pygame.draw.line(screen, (220,220,230), (pole_x, pole_bottom_y), (pole_x, py), 3)
-            screen.blit(flag_anchor["shadow"], (px - flag_anchor["img"].get_width()//2 + 2, py + 2))
-            screen.blit(flag_anchor["img"], (px - flag_anchor["img"].get_width()//2, py))
+            screen.blit(flag_anchor["shadow"], (px - flag_anchor["half_w"] + 2, py + 2))
+            screen.blit(flag_anchor["img"], (px - flag_anchor["half_w"], py))
 
         # Logo slide, then bake
         if not logo_parked and now >= logo_show_time:
@@ -613,17 +783,13 @@ async def game():
                 logo_parked = True
                 logo_active = False
                 # bake once
-                bg_with_logo = bg.copy()
-                bg_with_logo.blit(logo_card, logo_rect.topleft)
-                try: bg_with_logo = bg_with_logo.convert()
-                except Exception: pass
-                using_baked_logo = True
+                bg.blit(logo_card, logo_rect.topleft)
             else:
                 ease = 1 - (1 - t) ** 3
                 cur_y = int(logo_start_y + (logo_center_y - logo_start_y) * ease)
                 logo_rect.center = (sw//2, cur_y)
 
-        if not using_baked_logo and now >= logo_show_time:
+        if not logo_parked and now >= logo_show_time:
             screen.blit(logo_card, logo_rect.topleft)
 
         if show_fps:
@@ -633,7 +799,8 @@ async def game():
         pygame.display.flip()
 
         # Yield to browser (pygbag requirement)
-        await asyncio.sleep(0)
+        if IS_WEB:
+            await asyncio.sleep(0)
 
 def main():
     asyncio.run(game())
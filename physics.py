@@ -0,0 +1,94 @@
+# physics.py — per-frame update kernels over struct-of-arrays pools
+# - Numba-compiled scalar loops on desktop (cache=True keeps startup cheap)
+# - Numba is not available under pygbag/Pyodide: same kernels as NumPy vector ops
+# - Kernels mutate the arrays they are given in place
+#
+# update_smoke: rise, grow and fade puffs, compacting live ones to the front; returns the live count
+# update_bombs: integrate falling bombs, marking the ones reaching hit_y; returns how many did
+# aa_hit_test:  per burst in order, the first eligible plane centre inside its radius, or -1;
+#               a plane once hit is cleared from `eligible`, so it falls to at most one burst
+
+import numpy as np
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+if HAVE_NUMBA:
+    @njit(cache=True)
+    def update_smoke(x, y, vy, r, a, tone, dr, da, dt):
+        n = 0
+        for i in range(x.shape[0]):
+            ai = a[i] - da[i]*dt
+            if ai > 6.0:
+                x[n] = x[i]
+                y[n] = y[i] + vy[i]*dt
+                vy[n] = vy[i]
+                r[n] = r[i] + dr[i]*dt
+                a[n] = ai
+                tone[n] = tone[i]
+                n += 1
+        return n
+
+    @njit(cache=True)
+    def update_bombs(y, vy, hit_y, exploded, start, now, dt, gravity):
+        hits = 0
+        for i in range(y.shape[0]):
+            if exploded[i]:
+                continue
+            vy[i] += gravity*dt
+            y[i] += vy[i]*dt
+            if y[i] >= hit_y[i]:
+                exploded[i] = True
+                start[i] = now
+                hits += 1
+        return hits
+
+    @njit(cache=True)
+    def aa_hit_test(cx, cy, eligible, bx, by, r2):
+        hit = np.full(bx.shape[0], -1, np.int64)
+        for j in range(bx.shape[0]):
+            for i in range(cx.shape[0]):
+                if not eligible[i]:
+                    continue
+                dx = cx[i] - bx[j]
+                dy = cy[i] - by[j]
+                if dx*dx + dy*dy <= r2[j]:
+                    hit[j] = i
+                    eligible[i] = False
+                    break
+        return hit
+
+else:
+    def update_smoke(x, y, vy, r, a, tone, dr, da, dt):
+        y += vy*dt
+        r += dr*dt
+        a -= da*dt
+        alive = a > 6.0
+        n = int(np.count_nonzero(alive))
+        for col in (x, y, vy, r, a, tone):
+            col[:n] = col[alive]
+        return n
+
+    def update_bombs(y, vy, hit_y, exploded, start, now, dt, gravity):
+        falling = ~exploded
+        vy[falling] += gravity*dt
+        y[falling] += vy[falling]*dt
+        hit = falling & (y >= hit_y)
+        exploded |= hit
+        start[hit] = now
+        return int(np.count_nonzero(hit))
+
+    def aa_hit_test(cx, cy, eligible, bx, by, r2):
+        dx = bx[:, None] - cx[None, :]
+        dy = by[:, None] - cy[None, :]
+        inside = dx*dx + dy*dy <= r2[:, None]
+        hit = np.full(bx.shape[0], -1, np.int64)
+        for j in np.flatnonzero(inside.any(axis=1)).tolist():
+            cand = np.flatnonzero(inside[j] & eligible)
+            if cand.size:
+                hit[j] = cand[0]
+                eligible[cand[0]] = False
+        return hit